@@ -1,6 +1,8 @@
 import tkinter as tk
 from tkinter import ttk, messagebox
 import threading
+import queue
+import logging
 import main  # This imports your main.py script
 
 # Define the main application window
@@ -31,26 +33,121 @@ class App(tk.Tk):
         self.overall_progress_label.pack()
         self.overall_progress = ttk.Progressbar(self, length=200, mode='determinate')
         self.overall_progress.pack()
+        self.completed_count = 0
+
+        # Status line
+        self.status_label = tk.Label(self, text="Idle")
+        self.status_label.pack()
+
+        # The download thread never touches widgets directly; it puts messages
+        # on this queue and wakes the main loop with a virtual event.
+        self.queue = queue.Queue()
+        self.bind("<<ScraperMsg>>", lambda e: self.process_queue())
+
+        # Set once the window starts closing; after that the worker stops posting
+        self.closing = threading.Event()
+
+        # One long-lived download thread; each Start click queues a job for it
+        # and None tells it to exit.
+        self.work_queue = queue.Queue()
+        self.worker = threading.Thread(target=self.run_worker, daemon=True)
+        self.worker.start()
 
     def start_download(self):
-        title_ids = self.title_id_entry.get().split(',')
-        threading.Thread(target=self.download_title_ids, args=(title_ids,), daemon=True).start()
+        # Repeated IDs are only scraped once, so drop them here to keep the progress total right
+        title_ids = list(dict.fromkeys(title_id.strip() for title_id in self.title_id_entry.get().split(',') if title_id.strip()))
+        if title_ids:
+            self.work_queue.put(title_ids)
+
+    def run_worker(self):
+        while True:
+            title_ids = self.work_queue.get()
+            if title_ids is None:
+                break
+            try:
+                self.download_title_ids(title_ids)
+            except Exception as e:
+                self.post("status", f"Download stopped: {e}")
+
+    # Hand a message to the main thread; safe to call from the download thread
+    def post(self, kind, value):
+        # event_generate from another thread waits for the main loop to take it,
+        # which never happens once the window is closing
+        if self.closing.is_set():
+            return
+        self.queue.put((kind, value))
+        try:
+            self.event_generate("<<ScraperMsg>>", when="tail")
+        except (tk.TclError, RuntimeError):
+            # The window was closed while a download was still running
+            pass
 
     def download_title_ids(self, title_ids):
-        for title_id in title_ids:
-            title_id = title_id.strip()
-            if title_id:
-                main.download_covers(title_id)
-                main.download_updates(title_id)
-                self.history_listbox.insert(tk.END, title_id)
-                self.history_listbox.update_idletasks()
+        self.post("start", len(title_ids))
+        self.post("status", f"Processing {len(title_ids)} title IDs...")
+        failed_title_ids = main.scrape_multiple(title_ids, callback=self.on_title_done)
+        if failed_title_ids:
+            self.post("status", f"Failed: {', '.join(failed_title_ids)}")
+        else:
+            self.post("status", "Done.")
+
+    # Called by scrape_multiple on the GUI's download thread as each title ID finishes
+    def on_title_done(self, title_id, success):
+        self.post("history", title_id if success else f"{title_id} (failed)")
+        self.post("progress", 1)
+
+    # Apply queued messages from the download thread; runs on the main thread.
+    # The queue is drained first so each burst costs one widget update apiece.
+    def process_queue(self):
+        progress_delta = 0
+        new_hist = []
+        latest_status = None
+        new_total = None
+        try:
+            while True:
+                kind, value = self.queue.get_nowait()
+                if kind == "start":
+                    # A new batch resets the progress bar
+                    new_total = value
+                    progress_delta = 0
+                elif kind == "status":
+                    latest_status = value
+                elif kind == "history":
+                    new_hist.append(value)
+                elif kind == "progress":
+                    progress_delta += value
+        except queue.Empty:
+            pass
+
+        if new_total is not None:
+            self.completed_count = 0
+            self.overall_progress.configure(maximum=new_total, value=0)
+        if progress_delta:
+            self.completed_count += progress_delta
+            self.overall_progress["value"] = self.completed_count
+        if new_hist:
+            self.history_listbox.insert(tk.END, *new_hist)
+        if latest_status is not None:
+            self.status_label.configure(text=latest_status)
 
     def on_closing(self):
         if messagebox.askokcancel("Quit", "Do you want to quit?"):
+            self.closing.set()
+            # Drop batches that haven't started yet and tell the worker to stop.
+            # main.close() makes running downloads stop at their next block, so
+            # the process exits promptly; the daemon worker isn't joined here.
+            try:
+                while True:
+                    self.work_queue.get_nowait()
+            except queue.Empty:
+                pass
+            self.work_queue.put(None)
+            main.close(wait=False)
             self.destroy()
 
 # Run the application
 if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
     app = App()
     app.protocol("WM_DELETE_WINDOW", app.on_closing)
-    app.mainloop()
\ No newline at end of file
+    app.mainloop()
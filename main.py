@@ -1,131 +1,461 @@
 import os
 import requests
 import json
+import logging
 import re
-from requests.exceptions import RequestException, Timeout
-from time import sleep
+import threading
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, as_completed, wait
+from requests.adapters import HTTPAdapter
+from requests.exceptions import RequestException
+from urllib.parse import unquote
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # orjson is optional, fall back to the standard library
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# XboxUnity endpoints, filled in with str.format
+COVER_INFO_URL = 'http://xboxunity.net/Resources/Lib/CoverInfo.php?titleid={title_id}'
+UPDATE_INFO_URL = 'http://xboxunity.net/Resources/Lib/TitleUpdateInfo.php?titleid={title_id}'
+COVER_URL = 'http://xboxunity.net/Resources/Lib/Cover.php?size=large&cid={cover_id}'
+UPDATE_URL = 'http://xboxunity.net/Resources/Lib/TitleUpdate.php?tuid={tuid}'
+
+# Folder everything is saved under, one subfolder per title ID
+OUTPUT_DIR = 'unityscrape'
+
+# Number of title IDs processed at the same time
+MAX_TITLE_WORKERS = 4
+# Number of JSON, cover and update requests in flight across all titles,
+# which also caps the load put on xboxunity.net
+MAX_DOWNLOAD_WORKERS = 8
+
+# Block size used when streaming downloads to disk
+COPY_BUFFER_SIZE = 1024 * 1024
+
+# Retry policy for failed requests, waits grow exponentially between attempts
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 1
+
+# Shared HTTP session so connections to xboxunity.net are kept alive and reused.
+# Every request is made from the download pool, so the connection pool is sized
+# from it with headroom for direct download_covers/download_updates callers.
+# Retries happen inside urllib3, honouring any Retry-After from the server.
+SESSION = requests.Session()
+_retry = Retry(
+    total=MAX_RETRIES,
+    backoff_factor=BACKOFF_FACTOR,
+    status_forcelist=(429, 500, 502, 503, 504),
+    allowed_methods=('GET', 'HEAD'),
+    respect_retry_after_header=True,
+    # Hand the last error response back so raise_for_status reports its status
+    raise_on_status=False,
+)
+_adapter = HTTPAdapter(pool_connections=4, pool_maxsize=MAX_DOWNLOAD_WORKERS * 2, max_retries=_retry)
+SESSION.mount('http://', _adapter)
+SESSION.mount('https://', _adapter)
+# requests already advertises every encoding urllib3 can decode (gzip and deflate,
+# plus br/zstd when brotli or zstandard is installed), so only the agent is set
+SESSION.headers.update({'User-Agent': 'UnityScraper/1.0'})
+
+# Worker pools shared by every scrape_multiple call, created on first use.
+# Titles and their individual downloads run in separate pools so a title
+# waiting on its downloads can never take the workers they need.
+_executors = {}
+_executor_lock = threading.Lock()
+
+# Set by close(); running downloads stop at their next block and no new work starts
+_shutdown = threading.Event()
+
+def _get_executor(name, max_workers):
+    with _executor_lock:
+        if _shutdown.is_set():
+            raise RuntimeError("The scraper has been closed.")
+        if name not in _executors:
+            _executors[name] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix=f"unity-{name}")
+        return _executors[name]
+
+# Function to release the worker pools and HTTP connections. Pending work is
+# cancelled and running downloads stop at their next block, leaving .part files.
+def close(wait=True):
+    _shutdown.set()
+    with _executor_lock:
+        executors = list(_executors.values())
+        _executors.clear()
+    for executor in executors:
+        executor.shutdown(wait=wait, cancel_futures=True)
+    SESSION.close()
+
+# Directories already created while downloading the current title. It is reset
+# for every title, so folders deleted between GUI batches are created again.
+_ensured_dirs = set()
+
+# Function to create a directory once, later calls for the same path are free
+def ensure_dir(path):
+    if path not in _ensured_dirs:
+        os.makedirs(path, exist_ok=True)
+        _ensured_dirs.add(path)
+
+# Function to decode JSON bytes, raises ValueError if they aren't valid JSON
+def parse_json(content):
+    if orjson is not None:
+        return orjson.loads(content)
+    return json.loads(content)
+
+# Function to encode data as JSON bytes indented by two spaces, the same layout
+# with or without orjson
+def dump_json(data):
+    if orjson is not None:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2)
+    return json.dumps(data, indent=2, ensure_ascii=False).encode('utf-8')
+
+# Function to get the folder a titleid's files are saved in
+def get_title_path(title_id):
+    return os.path.join(OUTPUT_DIR, title_id)
+
+# Function to get the paths of a titleid's saved JSON and of its validators sidecar
+def get_json_paths(title_id, json_type):
+    directory_path = get_title_path(title_id)
+    return (os.path.join(directory_path, f'{json_type}_data.json'),
+            os.path.join(directory_path, f'{json_type}_data.meta.json'))
 
 # Function to save JSON response
 def save_json_response(title_id, data, json_type):
-    directory_path = f'unityscrape/{title_id}/'
-    os.makedirs(directory_path, exist_ok=True)
-    file_path = os.path.join(directory_path, f'{json_type}_data.json')
-    with open(file_path, 'w') as json_file:
-        json.dump(data, json_file, indent=4)
-    print(f"Saved {json_type} JSON response for title ID {title_id} at {file_path}")
-
-# Function to make a request with retries
-def make_request_with_retries(url, max_retries=3, timeout=10, stream=False):
-    retries = 0
-    while retries < max_retries:
-        try:
-            response = requests.get(url, timeout=timeout, stream=stream)
-            response.raise_for_status()
-            return response
-        except (RequestException, Timeout) as e:
-            wait = 2 ** retries  # exponential backoff
-            print(f"Request failed: {e}. Retrying in {wait} seconds...")
-            sleep(wait)
-            retries += 1
-    return None
+    ensure_dir(get_title_path(title_id))
+    file_path, _ = get_json_paths(title_id, json_type)
+    with open(file_path, 'wb') as json_file:
+        json_file.write(dump_json(data))
+    logger.info("Saved %s JSON response for title ID %s at %s", json_type, title_id, file_path)
+
+# Function to save the ETag/Last-Modified of a JSON response so the next run can
+# ask the server whether it changed instead of downloading it again
+def save_validators(meta_path, headers):
+    validators = {key: headers[key] for key in ('ETag', 'Last-Modified') if key in headers}
+    if validators:
+        with open(meta_path, 'wb') as meta_file:
+            meta_file.write(dump_json(validators))
+    elif os.path.exists(meta_path):
+        os.remove(meta_path)
+
+# Function to build If-None-Match/If-Modified-Since headers from a saved sidecar.
+# Nothing is sent unless the JSON it describes is still on disk to fall back on.
+def get_conditional_headers(file_path, meta_path):
+    if not os.path.isfile(file_path):
+        return {}
+    try:
+        with open(meta_path, 'rb') as meta_file:
+            validators = parse_json(meta_file.read())
+    except (OSError, ValueError):
+        return {}
+    headers = {}
+    if validators.get('ETag'):
+        headers['If-None-Match'] = validators['ETag']
+    if validators.get('Last-Modified'):
+        headers['If-Modified-Since'] = validators['Last-Modified']
+    return headers
+
+# Function to fetch a titleid's JSON, reusing the saved copy if the server answers
+# 304 Not Modified. Returns None if the request failed.
+def fetch_json(title_id, json_type, url):
+    file_path, meta_path = get_json_paths(title_id, json_type)
+    response = make_request_with_retries(url, headers=get_conditional_headers(file_path, meta_path))
+    if not response:
+        return None
+    if response.status_code == 304:
+        logger.info("%s JSON for title ID %s is unchanged, using saved copy.", json_type.capitalize(), title_id)
+        with open(file_path, 'rb') as json_file:
+            return parse_json(json_file.read())
+    data = parse_json(response.content)
+    save_json_response(title_id, data, json_type)
+    save_validators(meta_path, response.headers)
+    return data
+
+# Non-streamed GETs currently in flight, keyed by URL and request headers
+_inflight = {}
+_inflight_lock = threading.Lock()
+
+def _get(url, timeout, stream, headers):
+    try:
+        response = SESSION.get(url, timeout=timeout, stream=stream, headers=headers)
+        response.raise_for_status()
+        return response
+    except RequestException as e:
+        logger.warning("Request for %s failed: %s", url, e)
+        return None
+
+# Function to make a request, retries are handled by the session's adapter.
+# Concurrent non-streamed requests for the same URL share a single GET; streamed
+# bodies can only be read once, so those are always fetched separately.
+def make_request_with_retries(url, timeout=10, stream=False, headers=None):
+    if stream:
+        return _get(url, timeout, True, headers)
+    key = (url, tuple(sorted(headers.items())) if headers else ())
+    with _inflight_lock:
+        future = _inflight.get(key)
+        owner = future is None
+        if owner:
+            future = _inflight[key] = Future()
+    if not owner:
+        return future.result()
+    try:
+        response = _get(url, timeout, False, headers)
+        future.set_result(response)
+        return response
+    except BaseException as e:
+        future.set_exception(e)
+        raise
+    finally:
+        with _inflight_lock:
+            del _inflight[key]
+
+# Function to ask for a URL's headers only, None if the server doesn't answer HEAD
+def make_head_request(url, timeout=5):
+    try:
+        response = SESSION.head(url, timeout=timeout, allow_redirects=True)
+        response.raise_for_status()
+        return response
+    except RequestException:
+        return None
+
+# Function to read the body size from headers, None if unknown or the body is encoded
+def get_content_length(headers):
+    if headers.get('content-encoding', 'identity') != 'identity':
+        return None
+    try:
+        return int(headers['content-length'])
+    except (KeyError, ValueError):
+        return None
+
+# Function to check whether file_path already holds the body described by headers
+def is_already_downloaded(headers, file_path):
+    size = get_content_length(headers)
+    return size is not None and os.path.isfile(file_path) and os.path.getsize(file_path) == size
+
+# Function to stream a response body to disk in COPY_BUFFER_SIZE blocks. The body goes to
+# a .part file that only replaces file_path once it is complete, so an
+# interrupted download is never mistaken for a finished one; the .part file is
+# left behind to show which downloads need another try.
+def write_response_to_file(response, file_path):
+    part_path = file_path + '.part'
+    expected_size = get_content_length(response.headers)
+    response.raw.decode_content = True
+    with open(part_path, 'wb') as f:
+        # Tell the kernel the file is written front to back (POSIX only)
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        # Reserve the full size up front so large updates aren't extended block by block
+        if expected_size and hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(f.fileno(), 0, expected_size)
+            except OSError:
+                pass  # Not supported by this filesystem, the copy still works
+        # Copy block by block so close() can stop a long download part way
+        while True:
+            if _shutdown.is_set():
+                response.close()
+                raise RuntimeError(f"Download of {file_path} stopped by shutdown.")
+            block = response.raw.read(COPY_BUFFER_SIZE)
+            if not block:
+                break
+            f.write(block)
+        written = f.tell()
+    if expected_size is not None and written != expected_size:
+        raise ValueError(f"Incomplete download for {file_path}: got {written} of {expected_size} bytes.")
+    os.replace(part_path, file_path)
 
 # Function to extract filename from Content-Disposition header
+# filename*=charset'lang'percent-encoded-value (RFC 5987) is preferred when present
+_CD_EXT_RE = re.compile(r"filename\*\s*=\s*([\w!#$%&+^`{}~-]*)'[^']*'([^;\s]+)", re.I)
+_CD_RE = re.compile(r'filename\s*=\s*(?:"([^"]*)"|([^;]*))', re.I)
+
+# Function to reduce a server-supplied name to a bare filename, so a header
+# can never point a download outside its folder
+def _safe_filename(name):
+    name = os.path.basename(name.replace('\\', '/').strip())
+    return None if name in ('', '.', '..') else name
+
 def get_filename_from_cd(cd):
     if not cd:
         return None
-    fname = re.findall('filename="?(.+)"?', cd)
-    if len(fname) == 0:
+    match = _CD_EXT_RE.search(cd)
+    if match:
+        charset, value = match.groups()
+        try:
+            return _safe_filename(unquote(value, encoding=charset or 'utf-8'))
+        except LookupError:  # unknown charset
+            return _safe_filename(unquote(value))
+    if 'filename=' in cd:
+        value = cd.split('filename=', 1)[1].lstrip()
+        if value.startswith('"'):
+            # Quoted names may contain ';', so read up to the closing quote
+            return _safe_filename(value[1:].split('"', 1)[0])
+        return _safe_filename(value.split(';', 1)[0])
+    match = _CD_RE.search(cd)
+    if not match:
         return None
-    return fname[0].strip().strip('"')
+    quoted, plain = match.groups()
+    return _safe_filename(quoted if quoted is not None else plain)
+
+# Functions to pick the output filename for a cover or update from its response headers
+def get_cover_filename(headers, cover_id):
+    filename = get_filename_from_cd(headers.get('content-disposition'))
+    if not filename:
+        content_type = headers.get('content-type')
+        extension = content_type.split('/')[-1] if content_type else 'jpg'
+        filename = f'{cover_id}.{extension}'
+    return filename
+
+def get_update_filename(headers, tuid):
+    # Default to a generic name if no filename is provided
+    return get_filename_from_cd(headers.get('content-disposition')) or f'update_{tuid}.bin'
+
+# Function to fetch the cover JSON for a given titleid
+def fetch_covers_data(title_id):
+    logger.info("Fetching covers for title ID %s...", title_id)
+    covers_data = fetch_json(title_id, 'covers', COVER_INFO_URL.format(title_id=title_id))
+    if covers_data is None:
+        raise ValueError(f"Failed to fetch covers for title ID {title_id} after retries.")
+    return covers_data
+
+# Function to fetch the update JSON for a given titleid
+def fetch_updates_data(title_id):
+    logger.info("Fetching updates for title ID %s...", title_id)
+    updates_data = fetch_json(title_id, 'updates', UPDATE_INFO_URL.format(title_id=title_id))
+    if updates_data is None:
+        raise ValueError(f"Failed to fetch updates for title ID {title_id} after retries.")
+    return updates_data
+
+# Functions to download a single cover or title update. Per-file messages are
+# logged at DEBUG so large titles don't flood the console; each returns True if
+# the file was downloaded and False if it was already up to date.
+def download_cover(title_id, cover_id):
+    logger.debug("Downloading cover %s for title ID %s...", cover_id, title_id)
+    image_url = COVER_URL.format(cover_id=cover_id)
+    cover_path = os.path.join(get_title_path(title_id), 'covers')
+    # Nothing can be on disk yet for a new folder, so only ask for headers when it exists
+    head = make_head_request(image_url) if os.path.isdir(cover_path) else None
+    if head and is_already_downloaded(head.headers, os.path.join(cover_path, get_cover_filename(head.headers, cover_id))):
+        logger.debug("Cover %s already downloaded, skipping.", cover_id)
+        return False
+    image_response = make_request_with_retries(image_url, stream=True)
+    if not image_response:
+        raise ValueError(f"Failed to download cover {cover_id} for title ID {title_id} after retries.")
+    filename = get_cover_filename(image_response.headers, cover_id)
+    ensure_dir(cover_path)
+    write_response_to_file(image_response, os.path.join(cover_path, filename))
+    logger.debug("Cover %s downloaded successfully.", cover_id)
+    return True
+
+def download_update(title_id, media_id, update):
+    tuid = update['TitleUpdateID']
+    version = update['Version']
+    logger.debug("Downloading update %s version %s for media ID %s under title ID %s...", tuid, version, media_id, title_id)
+    update_url = UPDATE_URL.format(tuid=tuid)
+    update_version_path = os.path.join(get_title_path(title_id), str(media_id), f'updateversion{version}')
+    head = make_head_request(update_url) if os.path.isdir(update_version_path) else None
+    if head and is_already_downloaded(head.headers, os.path.join(update_version_path, get_update_filename(head.headers, tuid))):
+        logger.debug("Update %s version %s already downloaded, skipping.", tuid, version)
+        return False
+    update_response = make_request_with_retries(update_url, stream=True)
+    if not update_response:
+        raise ValueError(f"Failed to download update {tuid} for title ID {title_id} after retries.")
+    filename = get_update_filename(update_response.headers, tuid)
+    ensure_dir(update_version_path)
+    write_response_to_file(update_response, os.path.join(update_version_path, filename))
+    logger.debug("Update %s version %s downloaded successfully.", tuid, version)
+    return True
+
+# Function to download the given kinds ('covers' and/or 'updates') for a titleid.
+# The JSON files are requested together, and each cover or update download is
+# queued on the shared download pool as soon as its JSON arrives; every job is
+# waited for, even after one fails. It blocks on the download pool, so it must
+# not be called from a task running on that pool.
+def _download_title(title_id, kinds_wanted):
+    _ensured_dirs.clear()
+    executor = _get_executor('download', MAX_DOWNLOAD_WORKERS)
+    fetchers = {'covers': fetch_covers_data, 'updates': fetch_updates_data}
+    kinds = {executor.submit(fetchers[kind], title_id): kind for kind in kinds_wanted}
+    metadata = set(kinds)
+    pending = set(kinds)
+    success = True
+    downloaded = skipped = 0
+    while pending:
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            kind = kinds.pop(future)
+            try:
+                data = future.result()
+                if future not in metadata:
+                    if data:
+                        downloaded += 1
+                    else:
+                        skipped += 1
+                    continue
+                if kind == 'covers':
+                    jobs = [(download_cover, title_id, cover['CoverID']) for cover in data['Covers']]
+                else:
+                    jobs = [(download_update, title_id, media['MediaID'], update)
+                            for media in data['MediaIDS'] for update in media['Updates']]
+                for func, *args in jobs:
+                    job = executor.submit(func, *args)
+                    kinds[job] = kind
+                    pending.add(job)
+            except Exception as e:
+                logger.error("An error occurred while processing %s for title ID %s: %s", kind, title_id, e)
+                success = False
+    logger.info("Title ID %s: %d files downloaded, %d already up to date.", title_id, downloaded, skipped)
+    return success
 
 # Function to download covers for a given titleid
 def download_covers(title_id):
-    try:
-        print(f"Fetching covers for title ID {title_id}...")
-        response = make_request_with_retries(f'http://xboxunity.net/Resources/Lib/CoverInfo.php?titleid={title_id}')
-        if not response:
-            raise ValueError(f"Failed to fetch covers for title ID {title_id} after retries.")
-        covers_data = response.json()
-        save_json_response(title_id, covers_data, 'covers')
-        for cover in covers_data['Covers']:
-            cover_id = cover['CoverID']
-            print(f"Downloading cover {cover_id} for title ID {title_id}...")
-            image_url = f'http://xboxunity.net/Resources/Lib/Cover.php?size=large&cid={cover_id}'
-            image_response = make_request_with_retries(image_url, stream=True)
-            if not image_response:
-                raise ValueError(f"Failed to download cover {cover_id} for title ID {title_id} after retries.")
-            filename = get_filename_from_cd(image_response.headers.get('content-disposition'))
-            if not filename:
-                content_type = image_response.headers.get('content-type')
-                extension = content_type.split('/')[-1] if content_type else 'jpg'
-                filename = f'{cover_id}.{extension}'
-            cover_path = f'unityscrape/{title_id}/covers/'
-            os.makedirs(cover_path, exist_ok=True)
-            with open(os.path.join(cover_path, filename), 'wb') as f:
-                for chunk in image_response.iter_content(chunk_size=8192):
-                    f.write(chunk)
-            print(f"Cover {cover_id} downloaded successfully.")
-        return True
-    except Exception as e:
-        print(f"An error occurred while processing covers for title ID {title_id}: {e}")
-        return False
+    return _download_title(title_id, ('covers',))
 
 # Function to download updates for a given titleid
 def download_updates(title_id):
-    try:
-        print(f"Fetching updates for title ID {title_id}...")
-        response = make_request_with_retries(f'http://xboxunity.net/Resources/Lib/TitleUpdateInfo.php?titleid={title_id}')
-        if not response:
-            raise ValueError(f"Failed to fetch updates for title ID {title_id} after retries.")
-        updates_data = response.json()
-        save_json_response(title_id, updates_data, 'updates')
-        for media in updates_data['MediaIDS']:
-            media_id = media['MediaID']
-            for update in media['Updates']:
-                tuid = update['TitleUpdateID']
-                version = update['Version']
-                print(f"Downloading update {tuid} version {version} for media ID {media_id} under title ID {title_id}...")
-                update_url = f'http://xboxunity.net/Resources/Lib/TitleUpdate.php?tuid={tuid}'
-                update_response = make_request_with_retries(update_url, stream=True)
-                if not update_response:
-                    raise ValueError(f"Failed to download update {tuid} for title ID {title_id} after retries.")
-                
-                # Extract the filename from the Content-Disposition header
-                content_disposition = update_response.headers.get('content-disposition')
-                filename = get_filename_from_cd(content_disposition)
-                if not filename:
-                    # Default to a generic name if no filename is provided
-                    filename = f'update_{tuid}.bin'
-                
-                update_version_path = f'unityscrape/{title_id}/{media_id}/updateversion{version}/'
-                os.makedirs(update_version_path, exist_ok=True)
-                with open(os.path.join(update_version_path, filename), 'wb') as f:
-                    for chunk in update_response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                print(f"Update {tuid} version {version} downloaded successfully.")
-        return True
-    except Exception as e:
-        print(f"An error occurred while processing updates for title ID {title_id}: {e}")
-        return False
+    return _download_title(title_id, ('updates',))
 
-# Main script
-def main():
-    title_ids = input("Enter title IDs separated by commas: ").split(',')
-    failed_title_ids = []
+# Function to download covers and updates for a given titleid at the same time
+def download_all(title_id):
+    return _download_title(title_id, ('covers', 'updates'))
 
-    for title_id in title_ids:
-        title_id = title_id.strip()
-        print(f"Processing title ID {title_id}...")
-        success_covers = download_covers(title_id)
-        success_updates = download_updates(title_id)
+# Function to download covers and updates for a single titleid
+def process_title(title_id):
+    logger.info("Processing title ID %s...", title_id)
+    success = download_all(title_id)
+    logger.info("Finished processing title ID %s.", title_id)
+    return success
 
-        if not success_covers or not success_updates:
-            failed_title_ids.append(title_id)
+# Function to process several titleids concurrently, returns the ones that failed.
+# callback(title_id, success) is called as each title finishes, on the thread that
+# called scrape_multiple (not a pool thread); other finished titles aren't reported until it returns.
+def scrape_multiple(title_ids, callback=None):
+    # A new batch after close() starts with fresh pools
+    _shutdown.clear()
+    # dict.fromkeys drops repeated title IDs while keeping their order
+    title_ids = list(dict.fromkeys(title_id.strip() for title_id in title_ids if title_id.strip()))
+    results = {}
+    executor = _get_executor('title', MAX_TITLE_WORKERS)
+    futures = {executor.submit(process_title, title_id): title_id for title_id in title_ids}
+    for future in as_completed(futures):
+        title_id = futures[future]
+        results[title_id] = future.result()
+        if callback:
+            callback(title_id, results[title_id])
+    return [title_id for title_id in title_ids if not results[title_id]]
 
-        print(f"Finished processing title ID {title_id}.")
+# Main script
+def main():
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    title_ids = input("Enter title IDs separated by commas: ").split(',')
+    try:
+        failed_title_ids = scrape_multiple(title_ids)
+    finally:
+        close()
 
     if failed_title_ids:
-        print(f"Failed to process the following title IDs: {', '.join(failed_title_ids)}")
+        logger.error("Failed to process the following title IDs: %s", ', '.join(failed_title_ids))
 
 if __name__ == "__main__":
     main()